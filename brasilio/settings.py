@@ -12,7 +12,7 @@ environ.Env.read_env(".env")
 
 ALLOWED_HOSTS = env("ALLOWED_HOSTS", default="").split(",")
 APP_HOST = env("APP_HOST", default="brasil.io")
-BLOCKED_AGENTS = env.list("BLOCKED_AGENTS", default=[])
+BLOCKED_AGENTS = [a.lower() for a in env.list("BLOCKED_AGENTS", default=[])]
 BLOCKED_WEB_AGENTS = [a.lower() for a in env.list("BLOCKED_WEB_AGENTS", default=[])]
 BASE_DIR = root()
 DEBUG = env("DEBUG")
@@ -273,3 +273,9 @@ sentry_sdk.init(
 
 
 CSV_EXPORT_MAX_ROWS = env.int("CSV_EXPORT_MAX_ROWS", default=10_000)
+# Exports bigger than this are generated by the worker and sent by email (only
+# for logged users), so they don't hold a web worker during the download
+CSV_EXPORT_ASYNC_MIN_ROWS = env.int("CSV_EXPORT_ASYNC_MIN_ROWS", default=5_000)
+CSV_EXPORT_STORAGE_PATH = env("CSV_EXPORT_STORAGE_PATH", default="exports")
+# Seconds the emailed download links (and the exported files) are valid
+CSV_EXPORT_EXPIRATION = env.int("CSV_EXPORT_EXPIRATION", default=24 * 3600)
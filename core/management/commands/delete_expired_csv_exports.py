@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.util import delete_expired_csv_exports
+
+
+class Command(BaseCommand):
+    help = "Deleta os CSVs exportados em segundo plano que já expiraram"
+
+    def handle(self, *args, **kwargs):
+        deleted = delete_expired_csv_exports()
+        print(f"Deleted {len(deleted)} expired CSV exports.")
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.1 on 2026-10-15 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0022_auto_20200918_1805"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="dataset",
+            index=models.Index(condition=models.Q(show=True), fields=["name"], name="idx_dataset_name_show"),
+        ),
+    ]
@@ -138,15 +138,22 @@ class DatasetTableModelQuerySet(models.QuerySet):
             return self._count
 
         query = self.query
+        estimated_count = None
         if not query.where:  # TODO: check groupby etc.
+            # Postgres' COUNT(*) is O(N), so use planner's estimate for
+            # unfiltered querysets
             try:
                 with connection.cursor() as cursor:
                     cursor.execute(
-                        "SELECT reltuples FROM pg_class WHERE relname = %s", [query.model._meta.db_table],
+                        "SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [query.model._meta.db_table],
                     )
-                    self._count = int(cursor.fetchone()[0])
+                    estimated_count = int(cursor.fetchone()[0])
             except Exception:
-                self._count = super().count()
+                pass
+        # `reltuples` is negative (or zero, depending on Postgres version) if
+        # the table was never analysed, so the estimate can't be trusted
+        if estimated_count is not None and estimated_count > 0:
+            self._count = estimated_count
         else:
             self._count = super().count()
 
@@ -167,6 +174,12 @@ class Dataset(models.Model):
     source_name = models.CharField(max_length=255, null=False, blank=False)
     source_url = models.URLField(max_length=2000, null=False, blank=False)
 
+    class Meta:
+        indexes = [
+            # Dataset listings only show visible datasets, ordered by name
+            models.Index(fields=["name"], name="idx_dataset_name_show", condition=models.Q(show=True)),
+        ]
+
     @property
     def tables(self):
         # By now we're ignoring version - just take the last one
@@ -324,6 +337,10 @@ class Table(models.Model):
     def fields(self):
         return self.field_set.all()
 
+    @cached_property
+    def fields_list(self):
+        return list(self.fields)
+
     @property
     def enabled(self):
         return not self.hidden
@@ -0,0 +1,139 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """`DjangoJSONEncoder` truncates times to milliseconds, which would make
+    the cursor repeat or skip rows"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPaginator(Paginator):
+    """
+    Paginator which seeks the rows after (or before) a cursor instead of using
+    `LIMIT/OFFSET`, so the database doesn't need to scan all the rows from the
+    previous pages and the cost of a page does not depend on its depth.
+
+    The cursor is the values of the ordering fields of the last (or first) row
+    of the neighbour page. Keyset pagination is only possible when the
+    queryset is ordered by model fields - if it's not the case (or no cursor
+    is provided) it falls back to the regular `Paginator`.
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = self.get_keyset_ordering()
+
+    def get_keyset_ordering(self):
+        query = self.object_list.query
+        model = self.object_list.model
+        order_by = list(query.order_by or (model._meta.ordering if query.default_ordering else []) or [])
+        if not order_by:
+            return None
+
+        ordering = []
+        for field_name in order_by:
+            if not isinstance(field_name, str):  # Expressions
+                return None
+            descending = field_name.startswith("-")
+            field_name = field_name.lstrip("-")
+            try:
+                field = model._meta.pk if field_name == "pk" else model._meta.get_field(field_name)
+            except FieldDoesNotExist:  # Annotations, like search rank
+                return None
+            if not field.concrete:
+                return None
+            ordering.append((field, descending))
+
+        # The primary key is used as a tiebreaker so ordering is deterministic.
+        # The ordering is explicitly set in a new queryset: appending "pk" to
+        # an empty `query.order_by` would drop the model's Meta.ordering.
+        pk = model._meta.pk
+        if pk not in [field for field, _ in ordering]:
+            count = getattr(self.object_list, "_count", None)
+            self.object_list = self.object_list.order_by(*order_by, "pk")
+            if count is not None:  # Keep the count cached by `DatasetTableModelQuerySet`
+                self.object_list._count = count
+            ordering.append((pk, False))
+        return ordering
+
+    def encode_cursor(self, row):
+        if self.ordering is None or row is None:
+            return None
+        values = [getattr(row, field.attname) for field, _ in self.ordering]
+        data = json.dumps(values, cls=CursorJSONEncoder).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, cursor):
+        if self.ordering is None or not cursor:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(data)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                return None
+            return [field.to_python(value) for (field, _), value in zip(self.ordering, values)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def seek_filter(self, values, backwards=False):
+        """Build `(a > x) OR (a = x AND b > y) OR ...` for the ordering fields
+
+        Postgres sorts NULLs as if they were bigger than any value (NULLS LAST
+        for ASC, NULLS FIRST for DESC), so they're handled the same way here."""
+        condition = Q()
+        equal_fields = Q()
+        for (field, descending), value in zip(self.ordering, values):
+            name = field.attname
+            if descending != backwards:  # Rows with smaller values
+                after = Q(**{f"{name}__isnull": False}) if value is None else Q(**{f"{name}__lt": value})
+            elif value is None:  # Nothing is bigger than NULL
+                after = None
+            else:  # Rows with bigger values (or NULL)
+                after = Q(**{f"{name}__gt": value})
+                if field.null:
+                    after |= Q(**{f"{name}__isnull": True})
+            if after is not None:
+                condition |= equal_fields & after
+            equal_fields &= Q(**{f"{name}__isnull": True}) if value is None else Q(**{name: value})
+        return condition
+
+    def get_page(self, number, after=None, before=None):
+        try:
+            number = self.validate_number(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            return self.page(self.num_pages)
+        return self.page(number, after=after, before=before)
+
+    def page(self, number, after=None, before=None):
+        number = self.validate_number(number)
+        after, before = self.decode_cursor(after), self.decode_cursor(before)
+        if after is not None:
+            rows = list(self.object_list.filter(self.seek_filter(after))[: self.per_page])
+        elif before is not None:
+            rows = list(self.object_list.filter(self.seek_filter(before, backwards=True)).reverse()[: self.per_page])
+            rows.reverse()
+        else:
+            return self.decorate_page(super().page(number))
+        return self.decorate_page(self._get_page(rows, number, self))
+
+    def decorate_page(self, page):
+        # Materialize the rows once, so the template's `len`/iteration/indexing
+        # won't run the query again
+        rows = list(page.object_list)
+        page.object_list = rows
+        page.previous_cursor = self.encode_cursor(rows[0] if rows else None)
+        page.next_cursor = self.encode_cursor(rows[-1] if rows else None)
+        return page
@@ -0,0 +1,61 @@
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.mail import EmailMessage
+from django.http import QueryDict
+from django.urls import reverse
+from django_rq import job
+
+from core.models import Table, get_table
+from core.util import csv_export_token, delete_expired_csv_exports, queryset_to_csv
+
+
+def send_csv_export_email(user, subject, body):
+    email = EmailMessage(
+        subject=f"Brasil.IO: {subject}", body=body, from_email=settings.DEFAULT_FROM_EMAIL, to=[user.email],
+    )
+    email.send()
+
+
+@job
+def export_csv_task(dataset_slug, tablename, querystring, user_id, allow_hidden=False):
+    user = get_user_model().objects.get(pk=user_id)
+    delete_expired_csv_exports()
+
+    try:
+        table = get_table(dataset_slug, tablename, allow_hidden=allow_hidden)
+    except Table.DoesNotExist:
+        print(f"Table {dataset_slug}.{tablename} does not exist anymore, CSV export cancelled.")
+        send_csv_export_email(
+            user,
+            f"não foi possível exportar {dataset_slug}/{tablename}",
+            "A tabela que você filtrou não está mais disponível, por isso não foi possível gerar o arquivo CSV.",
+        )
+        return None
+
+    TableModel = table.get_model()
+    query, search_query, order_by = TableModel.objects.parse_querystring(QueryDict(querystring))
+    all_data = TableModel.objects.composed_query(query, search_query, order_by)
+
+    filename = f"{settings.CSV_EXPORT_STORAGE_PATH}/{dataset_slug}-{uuid.uuid4().hex}.csv"
+    with tempfile.TemporaryFile() as csv_file:
+        queryset_to_csv(all_data, table.fields, csv_file)
+        csv_file.seek(0)
+        filename = default_storage.save(filename, File(csv_file))
+    print(f"CSV export for {dataset_slug}.{tablename}?{querystring} saved to {filename}.")
+
+    # The file is not served directly from the storage: the link points to a
+    # view which checks the user and the link expiration
+    download_path = reverse("core:csv-export-download", args=[csv_export_token(filename, user.id)])
+    hours = settings.CSV_EXPORT_EXPIRATION // 3600
+    send_csv_export_email(
+        user,
+        f"exportação de {dataset_slug}/{tablename} concluída",
+        f"Os dados que você filtrou estão disponíveis para download (é necessário estar logado) em:\n\n"
+        f"https://{settings.APP_HOST}{download_path}\n\nO link expira em {hours} horas.",
+    )
+    return filename
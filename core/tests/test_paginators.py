@@ -0,0 +1,109 @@
+import datetime
+from unittest import mock
+
+from django.utils import timezone
+
+from core.paginators import KeysetPaginator
+from core.tests.utils import BaseTestCaseWithSampleDataset
+
+
+class KeysetPaginatorTests(BaseTestCaseWithSampleDataset):
+    DATASET_SLUG = "sample"
+    TABLE_NAME = "sample_table"
+    FIELDS_KWARGS = [
+        {"name": "sample_field", "options": {"max_length": 10}, "type": "text", "null": False},
+    ]
+
+    def setUp(self):
+        for value in "gfedcba":
+            self.TableModel.objects.create(sample_field=value)
+        self.queryset = self.TableModel.objects.order_by("sample_field")
+
+    def test_seek_next_page_after_cursor(self):
+        paginator = KeysetPaginator(self.queryset, 3)
+        first_page = paginator.get_page(1)
+        second_page = paginator.get_page(2, after=first_page.next_cursor)
+
+        assert ["a", "b", "c"] == [row.sample_field for row in first_page]
+        assert ["d", "e", "f"] == [row.sample_field for row in second_page]
+        assert 4 == second_page.start_index()
+
+    def test_seek_previous_page_before_cursor(self):
+        paginator = KeysetPaginator(self.queryset, 3)
+        third_page = paginator.get_page(3)
+        second_page = paginator.get_page(2, before=third_page.previous_cursor)
+
+        assert ["g"] == [row.sample_field for row in third_page]
+        assert ["d", "e", "f"] == [row.sample_field for row in second_page]
+
+    def test_keep_model_ordering_when_adding_pk_tiebreaker(self):
+        queryset = self.TableModel.objects.all()
+        with mock.patch.object(self.TableModel._meta, "ordering", ["-sample_field"]):
+            paginator = KeysetPaginator(queryset, 3)
+            first_page = paginator.get_page(1)
+            second_page = paginator.get_page(2, after=first_page.next_cursor)
+
+        assert ("-sample_field", "pk") == paginator.object_list.query.order_by
+        assert () == queryset.query.order_by
+        assert ["g", "f", "e"] == [row.sample_field for row in first_page]
+        assert ["d", "c", "b"] == [row.sample_field for row in second_page]
+
+    def test_fallback_to_offset_if_invalid_cursor(self):
+        paginator = KeysetPaginator(self.queryset, 3)
+        page = paginator.get_page(2, after="invalid")
+
+        assert ["d", "e", "f"] == [row.sample_field for row in page]
+
+    def test_fallback_to_offset_if_ordering_by_annotation(self):
+        queryset = self.TableModel.objects.extra(select={"rank": "1"}).order_by("rank")
+        paginator = KeysetPaginator(queryset, 3)
+
+        assert paginator.ordering is None
+        assert paginator.get_page(2).next_cursor is None
+
+
+class KeysetPaginatorNullableFieldsTests(BaseTestCaseWithSampleDataset):
+    DATASET_SLUG = "sample"
+    TABLE_NAME = "sample_table"
+    FIELDS_KWARGS = [
+        {"name": "sample_field", "options": {"max_length": 10}, "type": "text", "null": True},
+        {"name": "sample_datetime", "type": "datetime", "null": True},
+    ]
+
+    def pages(self, queryset, per_page, backwards=False):
+        paginator = KeysetPaginator(queryset, per_page)
+        number = paginator.num_pages if backwards else 1
+        page = paginator.get_page(number)
+        pages = [[row.id for row in page]]
+        while page.has_previous() if backwards else page.has_next():
+            if backwards:
+                page = paginator.get_page(number - 1, before=page.previous_cursor)
+                number -= 1
+            else:
+                page = paginator.get_page(number + 1, after=page.next_cursor)
+                number += 1
+            pages.append([row.id for row in page])
+        return pages[::-1] if backwards else pages
+
+    def test_seek_through_null_values(self):
+        for value in ["b", None, "a", None, "c", "a", None]:
+            self.TableModel.objects.create(sample_field=value)
+
+        for ordering in ("sample_field", "-sample_field"):
+            queryset = self.TableModel.objects.order_by(ordering)
+            expected = list(queryset.order_by(ordering, "pk").values_list("id", flat=True))
+
+            for backwards in (False, True):
+                pages = self.pages(queryset, 2, backwards=backwards)
+                assert expected == [row_id for page in pages for row_id in page]
+
+    def test_cursor_keeps_datetime_microseconds(self):
+        start = timezone.now().replace(microsecond=0)
+        for index in range(6):
+            self.TableModel.objects.create(sample_datetime=start + datetime.timedelta(microseconds=index * 100))
+        queryset = self.TableModel.objects.order_by("sample_datetime")
+        expected = list(queryset.order_by("sample_datetime", "pk").values_list("id", flat=True))
+
+        pages = self.pages(queryset, 2)
+
+        assert expected == [row_id for page in pages for row_id in page]
@@ -0,0 +1,89 @@
+import re
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from model_bakery import baker
+
+from core.tasks import export_csv_task
+from core.tests.utils import BaseTestCaseWithSampleDataset
+from core.util import delete_expired_csv_exports, load_csv_export_token
+
+
+class ExportCsvTaskTests(BaseTestCaseWithSampleDataset):
+    DATASET_SLUG = "sample"
+    TABLE_NAME = "sample_table"
+    FIELDS_KWARGS = [
+        {
+            "name": "sample_field",
+            "options": {"max_length": 10},
+            "type": "text",
+            "null": False,
+            "show_on_frontend": True,
+        },
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.table.filtering = ["sample_field"]
+        cls.table.save()
+        cls.TableModel = cls.table.get_model(cache=False)
+
+    def setUp(self):
+        self.user = baker.make(settings.AUTH_USER_MODEL, email="user@example.com")
+        for value in "ba":
+            self.TableModel.objects.create(sample_field=value)
+
+    def test_function_is_a_task(self):
+        assert getattr(export_csv_task, "delay", None)
+
+    def test_store_csv_and_email_signed_link(self):
+        filename = export_csv_task("sample", "sample_table", "sample_field=a", self.user.id)
+
+        assert filename.startswith(settings.CSV_EXPORT_STORAGE_PATH + "/sample-")
+        with default_storage.open(filename, "rb") as fobj:
+            lines = fobj.read().decode("utf-8").splitlines()
+        assert "sample_field" == lines[0]
+        assert ["a"] == lines[1:]
+        assert 1 == len(mail.outbox)
+        token = re.search(r"/exportacao/([^/\s]+)/", mail.outbox[0].body).group(1)
+        data, expires_in = load_csv_export_token(token)
+        assert {"filename": filename, "user_id": self.user.id} == data
+        assert settings.CSV_EXPORT_EXPIRATION - 5 < expires_in <= settings.CSV_EXPORT_EXPIRATION
+
+    def test_notify_user_if_table_does_not_exist(self):
+        result = export_csv_task("sample", "missing_table", "", self.user.id)
+
+        assert result is None
+        assert 1 == len(mail.outbox)
+        assert ["user@example.com"] == mail.outbox[0].to
+        assert "não foi possível exportar" in mail.outbox[0].subject
+
+
+@override_settings(CSV_EXPORT_STORAGE_PATH="test-exports", CSV_EXPORT_EXPIRATION=3600)
+class DeleteExpiredCsvExportsTests(TestCase):
+    def test_delete_only_expired_exports(self):
+        old = default_storage.save("test-exports/old.csv", ContentFile(b"old"))
+        new = default_storage.save("test-exports/new.csv", ContentFile(b"new"))
+        modified_times = {old: timezone.now() - timedelta(hours=2)}
+
+        def get_modified_time(name):
+            return modified_times.get(name, timezone.now())
+
+        with patch.object(default_storage, "get_modified_time", side_effect=get_modified_time):
+            deleted = delete_expired_csv_exports()
+
+        assert [old] == deleted
+        assert not default_storage.exists(old)
+        assert default_storage.exists(new)
+        default_storage.delete(new)
+
+    def test_do_nothing_if_export_path_does_not_exist(self):
+        with override_settings(CSV_EXPORT_STORAGE_PATH="not-created-exports"):
+            assert [] == delete_expired_csv_exports()
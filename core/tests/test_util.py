@@ -0,0 +1,56 @@
+import io
+from unittest import TestCase
+from unittest.mock import patch
+
+from core.tests.utils import BaseTestCaseWithSampleDataset
+from core.util import HTTP_JSON_CACHE, cached_http_get_json, queryset_to_csv
+
+
+class QuerysetToCsvTests(BaseTestCaseWithSampleDataset):
+    DATASET_SLUG = "sample"
+    TABLE_NAME = "sample_table"
+    FIELDS_KWARGS = [
+        {
+            "name": "cpf",
+            "options": {"max_length": 11},
+            "type": "text",
+            "null": False,
+            "obfuscate": True,
+            "show_on_frontend": True,
+            "order": 1,
+        },
+        {"name": "ativo", "type": "bool", "null": False, "show_on_frontend": True, "order": 2},
+        {"name": "escondido", "type": "text", "null": True, "show_on_frontend": False, "order": 3},
+        {"name": "nome", "type": "text", "null": False, "show_on_frontend": True, "order": 4},
+    ]
+
+    def test_export_visible_fields_in_header_order(self):
+        self.TableModel.objects.create(cpf="12345678901", ativo=True, escondido="x", nome="Ana")
+        self.TableModel.objects.create(cpf="abc", ativo=False, escondido="y", nome="Bia")
+        fobj = io.BytesIO()
+
+        queryset_to_csv(self.TableModel.objects.order_by("nome"), self.table.fields, fobj)
+
+        assert b"cpf,ativo,nome\n***456789**,True,Ana\nabc,False,Bia\n" == fobj.getvalue()
+
+
+class CachedHttpGetJsonTests(TestCase):
+    url = "https://data.brasil.io/meta/contribuidores.json"
+
+    def setUp(self):
+        HTTP_JSON_CACHE.clear()
+
+    def tearDown(self):
+        HTTP_JSON_CACHE.clear()
+
+    @patch("core.util.http_get_json")
+    def test_do_not_cache_failed_requests(self, mocked_get):
+        mocked_get.side_effect = [None, [{"name": "Ana"}]]
+
+        assert cached_http_get_json(self.url, 5) is None
+        assert [{"name": "Ana"}] == cached_http_get_json(self.url, 5)
+        # Cache key is only the URL, so a different timeout is a cache hit
+        assert [{"name": "Ana"}] == cached_http_get_json(self.url, 1)
+
+        assert 2 == mocked_get.call_count
+        assert [{"name": "Ana"}] == HTTP_JSON_CACHE[self.url]
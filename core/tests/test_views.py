@@ -1,3 +1,8 @@
+import re
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core import mail
 from django.core.management import call_command
 from django.test import override_settings
 from django.urls import reverse
@@ -23,6 +28,25 @@ class SampleDatasetDetailView(BaseTestCaseWithSampleDataset):
         assert 200 == response.status_code
         self.assertTemplateUsed(response, "core/dataset-detail.html")
 
+    def test_render_default_table_without_redirect(self):
+        self.table.default = True
+        self.table.save()
+        url = reverse("core:dataset-detail", args=["sample"])
+
+        response = self.client.get(url)
+
+        assert 200 == response.status_code
+        self.assertTemplateUsed(response, "core/dataset-detail.html")
+        assert self.table == response.context["table"]
+        assert response.context["canonical_url"].endswith(self.url)
+
+    def test_404_if_invalid_pagination_params(self):
+        invalid_params = [{"page": "foo"}, {"page": "0"}, {"items": "bar"}, {"items": "0"}, {"items": "-1"}]
+        for params in invalid_params:
+            response = self.client.get(self.url, params)
+            assert 404 == response.status_code
+            self.assertTemplateUsed(response, "404.html")
+
     @override_settings(RATELIMIT_ENABLE=True)
     @override_settings(RATELIMIT_RATE="0/s")
     def test_enforce_rate_limit_if_flagged(self):
@@ -33,6 +57,86 @@ class SampleDatasetDetailView(BaseTestCaseWithSampleDataset):
         assert 429 == response.context["title_4xx"]
 
 
+class CsvExportViewTests(BaseTestCaseWithSampleDataset):
+    DATASET_SLUG = "sample"
+    TABLE_NAME = "sample_table"
+    FIELDS_KWARGS = [
+        {
+            "name": "sample_field",
+            "options": {"max_length": 10},
+            "type": "text",
+            "null": False,
+            "show_on_frontend": True,
+        },
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.table.filtering = ["sample_field"]
+        cls.table.save()
+        cls.TableModel = cls.table.get_model(cache=False)
+
+    def setUp(self):
+        self.url = reverse("core:dataset-table-detail", args=["sample", "sample_table"])
+        self.params = {"format": "csv", "sample_field": "a"}
+        self.user = baker.make(settings.AUTH_USER_MODEL, email="user@example.com")
+        for value in "aaabc":
+            self.TableModel.objects.create(sample_field=value)
+
+    def get_download_path(self, email):
+        return re.search(r"https://[^/]+(/exportacao/[^/\s]+/)", email.body).group(1)
+
+    @override_settings(CSV_EXPORT_ASYNC_MIN_ROWS=2)
+    def test_schedule_big_export_and_email_download_link(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(self.url, self.params, HTTP_USER_AGENT="Mozilla")
+
+        assert 202 == response.status_code
+        self.assertTemplateUsed(response, "core/202-csv-export-scheduled.html")
+        assert 1 == len(mail.outbox)
+        assert ["user@example.com"] == mail.outbox[0].to
+
+        response = self.client.get(self.get_download_path(mail.outbox[0]))
+        assert 200 == response.status_code
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        assert "sample_field" == lines[0]
+        assert ["a", "a", "a"] == lines[1:]
+
+    @override_settings(CSV_EXPORT_ASYNC_MIN_ROWS=2)
+    def test_redirect_to_presigned_url_if_storage_supports_it(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url, self.params, HTTP_USER_AGENT="Mozilla")
+        download_path = self.get_download_path(mail.outbox[0])
+
+        with patch("core.views.storage_download_url", return_value="https://storage.example.com/signed") as url:
+            response = self.client.get(download_path)
+
+        assert 302 == response.status_code
+        assert "https://storage.example.com/signed" == response.url
+        assert url.call_args[0][0].startswith(settings.CSV_EXPORT_STORAGE_PATH + "/sample-")
+        assert 0 < url.call_args[1]["expires"] <= 5 * 60
+
+    @override_settings(CSV_EXPORT_ASYNC_MIN_ROWS=2)
+    def test_download_link_only_works_for_the_user_who_exported(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url, self.params, HTTP_USER_AGENT="Mozilla")
+        download_path = self.get_download_path(mail.outbox[0])
+
+        self.client.force_login(baker.make(settings.AUTH_USER_MODEL))
+        response = self.client.get(download_path)
+
+        assert 404 == response.status_code
+
+    @override_settings(CSV_EXPORT_ASYNC_MIN_ROWS=2)
+    def test_stream_big_export_for_anonymous_users(self):
+        response = self.client.get(self.url, self.params, HTTP_USER_AGENT="Mozilla")
+
+        assert 200 == response.status_code
+        assert 0 == len(mail.outbox)
+
+
 class TestDatasetFilesDetailView(BaseTestCaseWithSampleDataset):
     DATASET_SLUG = "sample"
     TABLE_NAME = "sample_table"
@@ -14,7 +14,7 @@ urlpatterns = [
     path("contato/", views.contact, name="contact"),
     path("datasets/", views.dataset_list, name="dataset-list"),
     path("home/", views.home, name="home"),
-    path("dataset/<slug>/", views.dataset_detail, name="dataset-detail"),
+    path("dataset/<slug>/", enable_ratelimit(views.dataset_detail), name="dataset-detail"),
     path("dataset/<slug>/files/", views.dataset_files_detail, name="dataset-files-detail"),
     path("dataset/<slug>/<tablename>/", enable_ratelimit(views.dataset_detail), name="dataset-table-detail"),
     path("datasets/sugira/", views.dataset_suggestion, name="dataset-suggestion"),
@@ -22,6 +22,7 @@ urlpatterns = [
     path("colabore/", views.collaborate, name="collaborate"),
     path("doe/", views.donate, name="donate"),
     path("contribuidores/", views.contributors, name="contributors"),
+    path("exportacao/<token>/", login_required(views.csv_export_download), name="csv-export-download"),
     # Dataset-specific pages (specials)
     path("especiais/", views_special.index, name="specials"),
     path(
@@ -1,11 +1,23 @@
+import csv
 import gzip
+import io
 import json
+import os
 import socket
+import time
+from datetime import timedelta
 from textwrap import dedent
 from urllib.request import Request, URLError, urlopen
 
 import django.db.models.fields
 from cachetools import TTLCache, cached
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import Case, F, TextField, Value, When
+from django.db.models.functions import Concat, Length, Substr
+from django.utils import timezone
 
 USER_AGENT = "brasil.io-backend"
 
@@ -24,6 +36,113 @@ def create_object(Model, data):
     return Model(**data)
 
 
+def queryset_to_csv(queryset, fields, fobj):
+    """Export the visible `fields` from `queryset` as CSV into binary `fobj`.
+
+    Rows are serialized by Postgres using `COPY (SELECT ...) TO STDOUT`, so no
+    model instance nor Python-level CSV writing is needed for each row.
+    Obfuscation (same rule as `core.templatetags.utils.obfuscate`) and boolean
+    formatting are done in SQL. Values use Postgres' text format, so lines end
+    with "\n" (not "\r\n" as `csv.excel`), `timestamptz` offsets are written
+    as "+00" (not "+00:00") and JSON as JSON text."""
+
+    fields = [field for field in fields if field.show_on_frontend and field.name != "search_data"]
+    header = [field.name for field in fields]
+    header_buffer = io.StringIO()
+    csv.writer(header_buffer, dialect=csv.excel, lineterminator="\n").writerow(header)
+    fobj.write(header_buffer.getvalue().encode("utf-8"))
+    if not header:
+        return
+
+    # Every exported column is an annotation (even the plain ones): Django
+    # selects model columns before annotations and only reorders values_list
+    # results in Python, which doesn't happen here since the SQL goes to COPY.
+    # Annotations are selected in the order they're added (the header order).
+    annotations, columns = {}, []
+    for field in fields:
+        name, column = field.name, f"_export_{field.name}"
+        if field.obfuscate:
+            annotations[f"_length_{name}"] = Length(name)
+            annotations[column] = Case(
+                When(**{f"_length_{name}": 11}, then=Concat(Value("***"), Substr(name, 4, 6), Value("**"))),
+                default=name,
+                output_field=TextField(),
+            )
+        elif field.type == "bool":  # Postgres would export "t"/"f"
+            annotations[column] = Case(
+                When(**{name: True}, then=Value("True")),
+                When(**{name: False}, then=Value("False")),
+                output_field=TextField(),
+            )
+        else:
+            annotations[column] = F(name)
+        columns.append(column)
+
+    sql, params = queryset.annotate(**annotations).values_list(*columns).query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        # COPY does not accept query parameters, so they're inlined by psycopg2
+        sql = cursor.mogrify(sql, params).decode("utf-8")
+        cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH CSV", fobj)
+
+
+def csv_export_token(filename, user_id):
+    return signing.dumps({"filename": filename, "user_id": user_id}, salt="core.csv_export")
+
+
+def load_csv_export_token(token):
+    """Return the data signed by `csv_export_token` and for how many seconds
+    the token is still valid, raising `signing.BadSignature` if invalid or
+    older than CSV_EXPORT_EXPIRATION"""
+    data = signing.loads(token, salt="core.csv_export", max_age=settings.CSV_EXPORT_EXPIRATION)
+    # `signing.dumps` appends the (base 62) signing timestamp to the payload
+    timestamp = signing.b62_decode(signing.Signer(salt="core.csv_export").unsign(token).rsplit(":", 1)[1])
+    return data, max(timestamp + settings.CSV_EXPORT_EXPIRATION - int(time.time()), 0)
+
+
+def storage_download_url(name, expires):
+    """Return a presigned URL to download `name` straight from the object
+    storage, valid for `expires` seconds, or `None` if the storage can't sign
+    URLs (like `FileSystemStorage`)"""
+    disposition = 'attachment; filename="{}"'.format(os.path.basename(name))
+    if hasattr(default_storage, "client") and hasattr(default_storage, "bucket_name"):  # django-minio-storage
+        return default_storage.client.presigned_get_object(
+            default_storage.bucket_name,
+            name,
+            expires=timedelta(seconds=expires),
+            response_headers={"response-content-disposition": disposition},
+        )
+    elif hasattr(default_storage, "bucket"):  # django-storages' S3Boto3Storage
+        # `S3Boto3Storage.url` doesn't sign URLs if AWS_S3_CUSTOM_DOMAIN is set
+        return default_storage.bucket.meta.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": default_storage.bucket.name,
+                "Key": default_storage._normalize_name(default_storage._clean_name(name)),
+                "ResponseContentDisposition": disposition,
+            },
+            ExpiresIn=expires,
+        )
+    return None
+
+
+def delete_expired_csv_exports():
+    """Delete exported CSVs older than CSV_EXPORT_EXPIRATION from the storage"""
+    path = settings.CSV_EXPORT_STORAGE_PATH
+    try:
+        _, filenames = default_storage.listdir(path)
+    except FileNotFoundError:
+        return []
+
+    expired_before = timezone.now() - timedelta(seconds=settings.CSV_EXPORT_EXPIRATION)
+    deleted = []
+    for filename in filenames:
+        filename = f"{path}/{filename}"
+        if default_storage.get_modified_time(filename) < expired_before:
+            default_storage.delete(filename)
+            deleted.append(filename)
+    return deleted
+
+
 def http_get(url, timeout):
     """Execute a HTTP GET request and returns `None` if `timeout` is achieved.
 
@@ -54,9 +173,21 @@ def http_get_json(url, timeout):
     return data
 
 
-@cached(cache=TTLCache(maxsize=100, ttl=24 * 3600))
+HTTP_JSON_CACHE = TTLCache(maxsize=100, ttl=24 * 3600)
+
+
 def cached_http_get_json(url, timeout):
-    return http_get_json(url, timeout)
+    """Same as `http_get_json` but keeps the parsed data in process memory.
+
+    Cache is keyed only by `url` and failed requests (`None`) are not cached,
+    so a timeout won't make the data unavailable until the cache expires."""
+
+    data = HTTP_JSON_CACHE.get(url)
+    if data is None:
+        data = http_get_json(url, timeout)
+        if data is not None:
+            HTTP_JSON_CACHE[url] = data
+    return data
 
 
 @cached(cache=TTLCache(maxsize=100, ttl=24 * 3600))
@@ -1,27 +1,29 @@
-import csv
+import operator
+import os
+import random
+import tempfile
 import uuid
+from functools import reduce
 
 from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.storage import default_storage
 from django.core.mail import EmailMessage
-from django.core.paginator import Paginator
 from django.db.models import Q
-from django.http import StreamingHttpResponse
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
 from core.forms import ContactForm, DatasetSearchForm
 from core.models import Dataset, Table
-from core.templatetags.utils import obfuscate
-from core.util import cached_http_get_json
+from core.paginators import KeysetPaginator
+from core.tasks import export_csv_task
+from core.util import cached_http_get_json, load_csv_export_token, queryset_to_csv, storage_download_url
 from traffic_control.logging import log_blocked_request
 
 
-class Echo:
-    def write(self, value):
-        return value
-
-
 def contact(request):
     sent = request.GET.get("sent", "").lower() == "true"
 
@@ -54,22 +56,17 @@ def contact(request):
     return render(request, "core/contact.html", {"form": form, "sent": sent})
 
 
-def queryset_to_csv(data, fields):
-    header = None
-    for row in data.iterator():
-        row_data = {}
-        for field in fields:
-            if not field.show_on_frontend or field.name == "search_data":
-                continue
-            else:
-                value = getattr(row, field.name)
-                if field.obfuscate:
-                    value = obfuscate(value)
-                row_data[field.name] = value
-        if header is None:
-            header = list(row_data.keys())
-            yield header
-        yield [row_data[field] for field in header]
+def get_int_param(querydict, key, default, min_value=1, max_value=None):
+    """Return `querydict[key]` as an integer (`default` if empty/missing and
+    `None` if invalid or lower than `min_value`), limited to `max_value`"""
+    value = querydict.get(key, "").strip()
+    try:
+        number = int(value) if value else default
+    except ValueError:
+        return None
+    if min_value is not None and number < min_value:
+        return None
+    return min(number, max_value) if max_value is not None else number
 
 
 def index(request):
@@ -81,17 +78,22 @@ def donate(request):
 
 
 def home(request):
-    context = {"datasets": Dataset.objects.filter(show=True).order_by("?")[:6]}
+    # Sampling in Python avoids running `ORDER BY RANDOM()` (full scan + sort)
+    # on every request. Only the columns used by the dataset card are fetched.
+    queryset = Dataset.objects.filter(show=True).only("id", "description", "icon", "name", "slug")
+    datasets = cache.get_or_set("home_datasets", lambda: list(queryset), 60)
+    context = {"datasets": random.sample(datasets, k=min(6, len(datasets)))}
     return render(request, "core/home.html", context)
 
 
 def dataset_list(request):
     form = DatasetSearchForm(request.GET)
-    q = Q(show=True)
-    if form.is_valid():
-        search_str = form.cleaned_data["search"]
-        for term in search_str.split(" "):
-            q &= Q(Q(description__icontains=term) | Q(name__icontains=term))
+    terms = form.cleaned_data["search"].split() if form.is_valid() else []
+    # `str.split()` without arguments drops empty terms (multiple spaces). The
+    # terms are combined into a flat AND with `show=True`, matching the partial
+    # index predicate.
+    term_filters = [Q(description__icontains=term) | Q(name__icontains=term) for term in terms]
+    q = reduce(operator.and_, term_filters, Q(show=True))
     context = {"datasets": Dataset.objects.filter(q).order_by("name"), "form": form}
     return render(request, "core/dataset-list.html", context)
 
@@ -103,9 +105,14 @@ def dataset_detail(request, slug, tablename=""):
         context = {"message": "Dataset does not exist"}
         return render(request, "404.html", context, status=404)
 
+    canonical_url = None
     if not tablename:
+        # Render the default table here instead of redirecting, so the first
+        # hit doesn't cost two requests
         tablename = dataset.get_default_table().name
-        return redirect(reverse("core:dataset-table-detail", kwargs={"slug": slug, "tablename": tablename},))
+        canonical_url = request.build_absolute_uri(
+            reverse("core:dataset-table-detail", kwargs={"slug": slug, "tablename": tablename})
+        )
 
     try:
         allow_hidden = request.user.is_superuser
@@ -121,32 +128,33 @@ def dataset_detail(request, slug, tablename=""):
             pass
         return render(request, "404.html", context, status=404)
 
-    querystring = request.GET.copy()
-    page_number = querystring.pop("page", ["1"])[0].strip() or "1"
-    items_per_page = querystring.pop("items", [str(settings.ROWS_PER_PAGE)])[0].strip() or str(settings.ROWS_PER_PAGE)
-    download_csv = querystring.pop("format", [""]) == ["csv"]
-    try:
-        page = int(page_number)
-    except ValueError:
+    page = get_int_param(request.GET, "page", 1)
+    if page is None:
         context = {"message": "Invalid page number."}
         return render(request, "404.html", context, status=404)
-    try:
-        items_per_page = int(items_per_page)
-    except ValueError:
+    items_per_page = get_int_param(request.GET, "items", settings.ROWS_PER_PAGE, max_value=1000)
+    if items_per_page is None:
         context = {"message": "Invalid items per page."}
         return render(request, "404.html", context, status=404)
-    items_per_page = min(items_per_page, 1000)
+    download_csv = request.GET.get("format") == "csv"
+    after = request.GET.get("after", "").strip()
+    before = request.GET.get("before", "").strip()
 
-    version = dataset.version_set.order_by("-order").first()
-    fields = table.fields
+    # Remaining keys are the table filters
+    querystring = request.GET.copy()
+    for key in ("page", "items", "format", "after", "before"):
+        querystring.pop(key, None)
+
+    version = dataset.get_last_version()
+    fields = table.fields_list
 
     TableModel = table.get_model()
     query, search_query, order_by = TableModel.objects.parse_querystring(querystring)
     all_data = TableModel.objects.composed_query(query, search_query, order_by)
 
     if download_csv:
-        user_agent = request.headers.get("User-Agent", "")
-        block_agent = any(True for agent in settings.BLOCKED_AGENTS if agent.lower() in user_agent.lower())
+        user_agent = request.headers.get("User-Agent", "").lower()
+        block_agent = any(agent in user_agent for agent in settings.BLOCKED_AGENTS)
 
         if not any([query, search_query]) or not user_agent or block_agent:
             # User trying to download a CSV without custom filters or invalid
@@ -157,29 +165,50 @@ def dataset_detail(request, slug, tablename=""):
             }
             return render(request, "4xx.html", context, status=400)
 
-        if all_data.count() > settings.CSV_EXPORT_MAX_ROWS:
+        total_count = all_data.count()
+        if total_count > settings.CSV_EXPORT_MAX_ROWS:
             context = {"message": "Max rows exceeded.", "title_4xx": "Oops! Ocorreu um erro:"}
             return render(request, "4xx.html", context, status=400)
 
+        if total_count > settings.CSV_EXPORT_ASYNC_MIN_ROWS and request.user.is_authenticated and request.user.email:
+            # Big exports are generated by the worker (instead of holding this
+            # web worker during the whole download) and sent by email
+            export_csv_task.delay(
+                dataset_slug=slug,
+                tablename=table.name,
+                querystring=querystring.urlencode(),
+                user_id=request.user.id,
+                allow_hidden=allow_hidden,
+            )
+            context = {
+                "html_code_snippet": "core/202-csv-export-scheduled.html",
+                "email": request.user.email,
+                "expiration_hours": settings.CSV_EXPORT_EXPIRATION // 3600,
+            }
+            return render(request, "4xx.html", context, status=202)
+
         filename = "{}-{}.csv".format(slug, uuid.uuid4().hex)
-        pseudo_buffer = Echo()
-        writer = csv.writer(pseudo_buffer, dialect=csv.excel)
-        csv_rows = queryset_to_csv(all_data, fields)
-        response = StreamingHttpResponse(
-            (writer.writerow(row) for row in csv_rows), content_type="text/csv;charset=UTF-8",
-        )
+        csv_file = tempfile.TemporaryFile()
+        try:
+            queryset_to_csv(all_data, fields, csv_file)
+        except Exception:
+            csv_file.close()
+            raise
+        csv_file.seek(0)
+        response = FileResponse(csv_file, content_type="text/csv;charset=UTF-8")
         response["Content-Disposition"] = 'attachment; filename="{}"'.format(filename)
         response.encoding = "UTF-8"
         return response
 
-    paginator = Paginator(all_data, items_per_page)
-    data = paginator.get_page(page)
+    paginator = KeysetPaginator(all_data, items_per_page)
+    data = paginator.get_page(page, after=after, before=before)
 
     for key, value in list(querystring.items()):
         if not value:
             del querystring[key]
 
     context = {
+        "canonical_url": canonical_url,
         "data": data,
         "dataset": dataset,
         "fields": fields,
@@ -188,13 +217,34 @@ def dataset_detail(request, slug, tablename=""):
         "querystring": querystring.urlencode(),
         "slug": slug,
         "table": table,
-        "table": table,
-        "total_count": all_data.count(),
+        "total_count": paginator.count,  # Cached by the paginator
         "version": version,
     }
     return render(request, "core/dataset-detail.html", context)
 
 
+def csv_export_download(request, token):
+    try:
+        data, expires_in = load_csv_export_token(token)
+    except signing.BadSignature:  # Also raised if expired
+        data = None
+    if not data or data["user_id"] != request.user.id or not default_storage.exists(data["filename"]):
+        context = {"message": "Link de download inválido ou expirado."}
+        return render(request, "404.html", context, status=404)
+
+    # The file is downloaded straight from the object storage (instead of
+    # holding this web worker during the whole download), so the link only
+    # needs to be valid until the download starts
+    url = storage_download_url(data["filename"], expires=max(min(expires_in, 5 * 60), 1))
+    if url is not None:
+        return redirect(url)
+
+    response = FileResponse(default_storage.open(data["filename"], "rb"), content_type="text/csv;charset=UTF-8")
+    response["Content-Disposition"] = 'attachment; filename="{}"'.format(os.path.basename(data["filename"]))
+    response.encoding = "UTF-8"
+    return response
+
+
 def dataset_suggestion(request):
     return render(request, "core/dataset-suggestion.html", {})
 
@@ -228,7 +278,8 @@ def dataset_files_detail(request, slug):
 
     context = {
         "dataset": dataset,
-        "capture_date": max([t.collect_date for t in dataset.tables]),
+        # `dataset.tables` are filtered by the last version
+        "capture_date": dataset.last_version.collected_at,
         "file_list": all_files,
     }
     return render(request, "core/dataset_files_list.html", context)